@@ -17,6 +17,8 @@
 
 import pyarrow
 
+_EXPECTED_P_SCHEMA = pyarrow.schema([("EXPR$0", pyarrow.int32())])
+
 
 def test_query_trivial(dremio_dbapi):
     with dremio_dbapi.cursor() as cur:
@@ -28,7 +30,7 @@ def test_query_partitioned(dremio_dbapi):
     with dremio_dbapi.cursor() as cur:
         partitions, schema = cur.adbc_execute_partitions("SELECT 1")
         assert len(partitions) == 1
-        assert schema.equals(pyarrow.schema([("EXPR$0", "int32")]))
+        assert schema.equals(_EXPECTED_P_SCHEMA)
 
         cur.adbc_read_partition(partitions[0])
         assert cur.fetchone() == (1,)
@@ -16,35 +16,110 @@
 # under the License.
 
 import pyarrow
+import pyarrow.compute as pc
 import pytest
 
 import adbc_driver_manager
 
-
-@pytest.fixture
+# Exporting a batch through the C Data Interface only adds references to
+# its buffers, so the same (immutable) batch can be bound repeatedly.
+_SAMPLE_BATCH = pyarrow.record_batch(
+    [
+        [1, 2, 3, 4],
+        ["a", "b", "c", "d"],
+    ],
+    names=["ints", "strs"],
+)
+_SAMPLE_TABLE = pyarrow.Table.from_batches([_SAMPLE_BATCH])
+# Several batches, so that ingest has to loop over the bound stream
+_FOO_TABLE = pyarrow.Table.from_batches([_SAMPLE_BATCH] * 3)
+_EXPECTED_TABLE_SELECT_1 = pyarrow.table([[1]], names=["1"])
+
+
+@pytest.fixture(scope="session")
 def sqlite():
-    """Dynamically load the SQLite driver."""
-    with adbc_driver_manager.AdbcDatabase(driver="adbc_driver_sqlite") as db:
+    """Dynamically load the SQLite driver once for the whole session."""
+    # A private in-memory database, visible only to this connection
+    with adbc_driver_manager.AdbcDatabase(
+        driver="adbc_driver_sqlite", uri=":memory:"
+    ) as db:
         with adbc_driver_manager.AdbcConnection(db) as conn:
             yield (db, conn)
 
 
-def _import(handle):
-    """Helper to import a C Data Interface handle."""
-    if isinstance(handle, adbc_driver_manager.ArrowArrayStreamHandle):
-        return pyarrow.RecordBatchReader._import_from_c(handle.address)
-    elif isinstance(handle, adbc_driver_manager.ArrowSchemaHandle):
-        return pyarrow.Schema._import_from_c(handle.address)
-    raise NotImplementedError(f"Importing {handle!r}")
+@pytest.fixture(autouse=True)
+def _reset_sqlite(request):
+    """Undo a test's changes, since the SQLite connection is shared."""
+    if "sqlite" not in request.fixturenames:
+        yield
+        return
+
+    _, conn = request.getfixturevalue("sqlite")
+    yield
+    # Discard any transaction left open by a test that disabled autocommit
+    try:
+        conn.rollback()
+    except adbc_driver_manager.ProgrammingError as e:
+        # Autocommit is enabled, so there is nothing to roll back
+        if e.status_code != adbc_driver_manager.AdbcStatusCode.INVALID_STATE:
+            raise
+    conn.set_autocommit(True)
+    for table_name in ("bar", "baz"):
+        with adbc_driver_manager.AdbcStatement(conn) as stmt:
+            stmt.set_sql_query(f"DROP TABLE IF EXISTS {table_name}")
+            stmt.execute_update()
+
+
+@pytest.fixture(scope="module")
+def foo_table(sqlite):
+    """Ingest _FOO_TABLE into table "foo" once for all readers."""
+    _, conn = sqlite
+    with adbc_driver_manager.AdbcStatement(conn) as stmt:
+        stmt.set_options(**{adbc_driver_manager.INGEST_OPTION_TARGET_TABLE: "foo"})
+        _bind_stream(stmt, _FOO_TABLE)
+        stmt.execute_update()
+    yield
+    with adbc_driver_manager.AdbcStatement(conn) as stmt:
+        stmt.set_sql_query("DROP TABLE foo")
+        stmt.execute_update()
+
+
+_import_stream_c = pyarrow.RecordBatchReader._import_from_c
+_import_schema_c = pyarrow.Schema._import_from_c
+
+
+def _import_stream(handle):
+    """Helper to import a C Data Interface ArrowArrayStream handle."""
+    return _import_stream_c(handle.address)
+
+
+def _import_schema(handle):
+    """Helper to import a C Data Interface ArrowSchema handle."""
+    return _import_schema_c(handle.address)
 
 
 def _bind(stmt, batch):
+    """Helper to bind a record batch (exported anew each call) to a statement."""
     array = adbc_driver_manager.ArrowArrayHandle()
     schema = adbc_driver_manager.ArrowSchemaHandle()
     batch._export_to_c(array.address, schema.address)
     stmt.bind(array, schema)
 
 
+def _bind_stream(stmt, table):
+    """Helper to bind a table to a statement as a stream of batches."""
+    reader = pyarrow.RecordBatchReader.from_batches(table.schema, table.to_batches())
+    stream = adbc_driver_manager.ArrowArrayStreamHandle()
+    reader._export_to_c(stream.address)
+    stmt.bind_stream(stream)
+
+
+def _contains_all(values, expected):
+    """Check that every (distinct) value of expected appears in values."""
+    found = pc.filter(values, pc.is_in(values, value_set=expected))
+    return pc.count_distinct(found).as_py() == len(expected)
+
+
 def test_version():
     assert adbc_driver_manager.__version__
 
@@ -68,74 +143,72 @@ def test_connection_get_info(sqlite):
         adbc_driver_manager.AdbcInfoCode.DRIVER_VERSION.value,
         adbc_driver_manager.AdbcInfoCode.DRIVER_ARROW_VERSION.value,
     ]
-    handle = conn.get_info()
-    table = _import(handle).read_all()
-    assert table.num_rows > 0
-    data = dict(zip(table[0].to_pylist(), table[1].to_pylist()))
-    for code in codes:
-        assert code in data
-        assert data[code]
+    expected = pyarrow.array([int(code) for code in codes], type=pyarrow.uint32())
 
     handle = conn.get_info()
-    table = _import(handle).read_all()
+    table = _import_stream(handle).read_all()
     assert table.num_rows > 0
-    assert set(codes) == set(table[0].to_pylist())
+    # Look up each code in place instead of converting the table to a dict
+    for code in expected:
+        index = pc.index(table[0], code).as_py()
+        assert index >= 0
+        assert table[1][index].as_py()
 
+    assert pc.all(pc.is_in(table[0], value_set=expected)).as_py()
+    assert pc.count_distinct(table[0]).as_py() == len(codes)
 
-@pytest.mark.sqlite
-def test_connection_get_objects(sqlite):
-    _, conn = sqlite
-    data = pyarrow.record_batch(
-        [
-            [1, 2, 3, 4],
-            ["a", "b", "c", "d"],
-        ],
-        names=["ints", "strs"],
-    )
-    with adbc_driver_manager.AdbcStatement(conn) as stmt:
-        stmt.set_options(**{adbc_driver_manager.INGEST_OPTION_TARGET_TABLE: "foo"})
-        _bind(stmt, data)
-        stmt.execute_update()
 
+def _check_objects(conn):
     handle = conn.get_objects(adbc_driver_manager.GetObjectsDepth.ALL)
-    table = _import(handle).read_all()
+    expected_tables = pyarrow.array(["foo"])
+    expected_columns = pyarrow.array(["ints", "strs"])
+
+    # Stop reading at the batch describing foo (which also holds its columns)
+    for batch in _import_stream(handle):
+        db_schemas = pc.list_flatten(batch.column(1))
+        tables = pc.list_flatten(db_schemas.field("db_schema_tables"))
+        columns = pc.list_flatten(tables.field("table_columns"))
+        found_table = _contains_all(tables.field("table_name"), expected_tables)
+        found_columns = _contains_all(columns.field("column_name"), expected_columns)
+        if found_table and found_columns:
+            break
+    else:
+        pytest.fail("Table foo or its columns not found")
+
+
+def _check_table_schema(conn):
+    handle = conn.get_table_schema(catalog=None, db_schema=None, table_name="foo")
+    assert _import_schema(handle).equals(_SAMPLE_BATCH.schema)
 
-    db_schemas = pyarrow.concat_arrays(table[1].chunks).flatten()
-    tables = db_schemas.flatten()[1].flatten()
-    table_names, _, columns, *_ = tables.flatten()
-    columns = columns.flatten()
-    column_names = columns.flatten()[0]
 
-    assert "foo" in table_names.to_pylist()
-    assert "ints" in column_names.to_pylist()
-    assert "strs" in column_names.to_pylist()
+def _check_select_all(conn):
+    with adbc_driver_manager.AdbcStatement(conn) as stmt:
+        stmt.set_sql_query("SELECT * FROM foo")
+        handle, _ = stmt.execute_query()
+        table = _import_stream(handle).read_all()
+        assert table.equals(_FOO_TABLE)
 
 
 @pytest.mark.sqlite
-def test_connection_get_table_schema(sqlite):
+@pytest.mark.parametrize(
+    "check",
+    [_check_objects, _check_table_schema, _check_select_all],
+    ids=["get_objects", "get_table_schema", "ingest"],
+)
+def test_foo_ingest(sqlite, foo_table, check):
     _, conn = sqlite
-    data = pyarrow.record_batch(
-        [
-            [1, 2, 3, 4],
-            ["a", "b", "c", "d"],
-        ],
-        names=["ints", "strs"],
-    )
-    with adbc_driver_manager.AdbcStatement(conn) as stmt:
-        stmt.set_options(**{adbc_driver_manager.INGEST_OPTION_TARGET_TABLE: "foo"})
-        _bind(stmt, data)
-        stmt.execute_update()
-
-    handle = conn.get_table_schema(catalog=None, db_schema=None, table_name="foo")
-    assert data.schema == _import(handle)
+    check(conn)
 
 
 @pytest.mark.sqlite
 def test_connection_get_table_types(sqlite):
     _, conn = sqlite
     handle = conn.get_table_types()
-    table = _import(handle).read_all()
-    assert "table" in table[0].to_pylist()
+    for batch in _import_stream(handle):
+        if _contains_all(batch.column(0), pyarrow.array(["table"])):
+            break
+    else:
+        pytest.fail("Table type 'table' not found")
 
 
 @pytest.mark.sqlite
@@ -144,8 +217,8 @@ def test_query(sqlite):
     with adbc_driver_manager.AdbcStatement(conn) as stmt:
         stmt.set_sql_query("SELECT 1")
         handle, _ = stmt.execute_query()
-        table = _import(handle).read_all()
-        assert table == pyarrow.table([[1]], names=["1"])
+        table = _import_stream(handle).read_all()
+        assert table.equals(_EXPECTED_TABLE_SELECT_1)
 
 
 @pytest.mark.sqlite
@@ -157,29 +230,8 @@ def test_prepared(sqlite):
 
         _bind(stmt, pyarrow.record_batch([[1, 2, 3, 4]], names=["1"]))
         handle, _ = stmt.execute_query()
-        table = _import(handle).read_all()
-        assert table == pyarrow.table([[1, 2, 3, 4]], names=["?"])
-
-
-@pytest.mark.sqlite
-def test_ingest(sqlite):
-    _, conn = sqlite
-    data = pyarrow.record_batch(
-        [
-            [1, 2, 3, 4],
-            ["a", "b", "c", "d"],
-        ],
-        names=["ints", "strs"],
-    )
-    with adbc_driver_manager.AdbcStatement(conn) as stmt:
-        stmt.set_options(**{adbc_driver_manager.INGEST_OPTION_TARGET_TABLE: "foo"})
-        _bind(stmt, data)
-        stmt.execute_update()
-
-        stmt.set_sql_query("SELECT * FROM foo")
-        handle, _ = stmt.execute_query()
-        table = _import(handle).read_all()
-        assert table == pyarrow.Table.from_batches([data])
+        table = _import_stream(handle).read_all()
+        assert table.equals(pyarrow.table([[1, 2, 3, 4]], names=["?"]))
 
 
 @pytest.mark.sqlite
@@ -199,65 +251,56 @@ def test_autocommit(sqlite):
         errholder.value.status_code == adbc_driver_manager.AdbcStatusCode.INVALID_STATE
     )
 
-    conn.set_autocommit(True)
-
     conn.set_autocommit(False)
 
     # Test rollback
-    data = pyarrow.record_batch(
-        [
-            [1, 2, 3, 4],
-            ["a", "b", "c", "d"],
-        ],
-        names=["ints", "strs"],
-    )
     with adbc_driver_manager.AdbcStatement(conn) as stmt:
-        stmt.set_options(**{adbc_driver_manager.INGEST_OPTION_TARGET_TABLE: "foo"})
-        _bind(stmt, data)
+        stmt.set_options(**{adbc_driver_manager.INGEST_OPTION_TARGET_TABLE: "bar"})
+        _bind(stmt, _SAMPLE_BATCH)
         stmt.execute_update()
 
-        stmt.set_sql_query("SELECT * FROM foo")
+        stmt.set_sql_query("SELECT * FROM bar")
         handle, _ = stmt.execute_query()
-        table = _import(handle).read_all()
-        assert table == pyarrow.Table.from_batches([data])
+        table = _import_stream(handle).read_all()
+        assert table.equals(_SAMPLE_TABLE)
 
     conn.rollback()
 
     # Data should not be readable
     with adbc_driver_manager.AdbcStatement(conn) as stmt:
         with pytest.raises(adbc_driver_manager.Error):
-            stmt.set_sql_query("SELECT * FROM foo")
+            stmt.set_sql_query("SELECT * FROM bar")
             stmt.execute_query()
 
     with adbc_driver_manager.AdbcStatement(conn) as stmt:
-        stmt.set_options(**{adbc_driver_manager.INGEST_OPTION_TARGET_TABLE: "foo"})
-        _bind(stmt, data)
+        stmt.set_options(**{adbc_driver_manager.INGEST_OPTION_TARGET_TABLE: "bar"})
+        _bind_stream(stmt, _SAMPLE_TABLE)
         stmt.execute_update()
 
     # Enabling autocommit should implicitly commit
     conn.set_autocommit(True)
     with adbc_driver_manager.AdbcStatement(conn) as stmt:
-        stmt.set_sql_query("SELECT * FROM foo")
+        stmt.set_sql_query("SELECT * FROM bar")
         handle, _ = stmt.execute_query()
-        table = _import(handle).read_all()
+        table = _import_stream(handle).read_all()
 
     conn.set_autocommit(False)
     with adbc_driver_manager.AdbcStatement(conn) as stmt:
-        stmt.set_options(**{adbc_driver_manager.INGEST_OPTION_TARGET_TABLE: "bar"})
-        _bind(stmt, data)
+        stmt.set_options(**{adbc_driver_manager.INGEST_OPTION_TARGET_TABLE: "baz"})
+        _bind_stream(stmt, _SAMPLE_TABLE)
         stmt.execute_update()
 
     # Explicit commit
     conn.commit()
     with adbc_driver_manager.AdbcStatement(conn) as stmt:
-        stmt.set_sql_query("SELECT * FROM foo")
+        stmt.set_sql_query("SELECT * FROM bar")
         handle, _ = stmt.execute_query()
-        table = _import(handle).read_all()
-        assert table == pyarrow.Table.from_batches([data])
+        table = _import_stream(handle).read_all()
+        assert table.equals(_SAMPLE_TABLE)
 
 
 @pytest.mark.sqlite
-def test_child_tracking(sqlite):
+def test_child_tracking():
     with adbc_driver_manager.AdbcDatabase(driver="adbc_driver_sqlite") as db:
         with adbc_driver_manager.AdbcConnection(db) as conn:
             with adbc_driver_manager.AdbcStatement(conn):